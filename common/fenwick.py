@@ -0,0 +1,32 @@
+from array import array
+
+
+class FenwickTree:
+    """Prefix sums over a fixed number of slots, with O(log n) point updates"""
+    def __init__(self, size: int):
+        self.size = size
+        self.tree = array("q", bytes(8 * (size + 1)))
+        self.total = 0
+
+    def add(self, index: int, delta: int):
+        self.total += delta
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def append(self, delta: int = 0):
+        """Adds a slot at the end"""
+        index = self.size + 1
+        # tree[index] holds the sum of the last (index & -index) slots up to index
+        self.tree.append(self.prefix(self.size) + delta - self.prefix(index - (index & -index)))
+        self.size = index
+        self.total += delta
+
+    def prefix(self, index: int) -> int:
+        """Sum of the slots before index"""
+        s = 0
+        while index > 0:
+            s += self.tree[index]
+            index -= index & -index
+        return s
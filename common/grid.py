@@ -0,0 +1,91 @@
+import os
+from typing import Iterator, Tuple
+
+# Byte used for the cells around the edge of the grid. It's the newline
+# that already ends each row, so rows can be read straight into place.
+BORDER = ord("\n")
+
+
+class Grid:
+    """
+    A rectangular character grid stored in one contiguous buffer.
+
+    Cells are addressed by flat integer indices. Each row is followed by its
+    newline, and there is a row of newlines above and below the grid, so
+    stepping off any edge lands on a BORDER cell instead of needing bounds
+    checks. Moving by one of offsets steps west, east, north or south.
+    """
+    def __init__(self, data: bytearray, width: int, height: int, start: int):
+        """
+        :param data: The buffer holding the grid, including its border
+        :param width: Number of cells in each row, not including the newline
+        :param height: Number of rows
+        :param start: Index of the top left cell in data
+        """
+        self.data = data
+        self.width = width
+        self.height = height
+        self.stride = width + 1
+        self.start = start
+        # W E N S
+        self.offsets = (-1, 1, -self.stride, self.stride)
+
+    @staticmethod
+    def read(filename: str) -> 'Grid':
+        """
+        Loads a grid into a mutable bytearray with BORDER cells on every side.
+        The file is read directly into place, so it's only copied once
+        (twice if it has CRLF line endings, which are turned into newlines).
+        """
+        with open(filename, "rb") as f:
+            first_line = f.readline()
+            width = len(first_line.rstrip(b"\r\n"))
+            f.seek(0)
+            stride = width + 1
+            size = os.fstat(f.fileno()).st_size
+            # Top border row, the file, a possibly missing final newline, bottom border row
+            data = bytearray(stride + size + 1 + stride)
+            with memoryview(data) as view:
+                length = f.readinto(view[stride:stride + size])
+
+        if first_line.endswith(b"\r\n"):
+            # Every row has to end in a single BORDER for the stride to line up
+            content = data[stride:stride + length].replace(b"\r\n", b"\n")
+            data[stride:stride + length] = content
+            length = len(content)
+
+        content_end = stride + length
+        while content_end > stride and data[content_end - 1] in b"\r\n \t":
+            content_end -= 1
+        height = (content_end - stride + 1) // stride
+        # The last row's newline and the bottom border row
+        end = stride * (height + 2)
+        data[content_end:end] = bytes([BORDER]) * (end - content_end)
+        del data[end:]
+        data[:stride] = bytes([BORDER]) * stride
+        return Grid(data, width, height, stride)
+
+    def index(self, x: int, y: int) -> int:
+        return self.start + y * self.stride + x
+
+    def pos(self, i: int) -> Tuple[int, int]:
+        y, x = divmod(i - self.start, self.stride)
+        return x, y
+
+    def row(self, y: int) -> memoryview:
+        """A view of row y, without copying it"""
+        i = self.index(0, y)
+        return memoryview(self.data)[i:i + self.width]
+
+    def rows(self) -> Iterator[memoryview]:
+        for y in range(self.height):
+            yield self.row(y)
+
+    def cells(self) -> Iterator[int]:
+        """Indices of every cell in the grid, row by row"""
+        for y in range(self.height):
+            i = self.index(0, y)
+            yield from range(i, i + self.width)
+
+    def __str__(self) -> str:
+        return "\n".join(bytes(row).decode() for row in self.rows())
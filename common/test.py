@@ -0,0 +1,39 @@
+import os
+import tempfile
+import unittest
+
+from grid import BORDER, Grid
+
+class TestGridRead(unittest.TestCase):
+    def read(self, contents: bytes) -> Grid:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filename = os.path.join(tmp_dir, "grid")
+            with open(filename, "wb") as f:
+                f.write(contents)
+            return Grid.read(filename)
+
+    def check_grid(self, grid: Grid) -> None:
+        self.assertEqual((grid.width, grid.height), (3, 2))
+        self.assertEqual(str(grid), "#.O\n..#")
+        self.assertEqual(grid.data[grid.index(2, 1)], ord("#"))
+        # Every step off the grid lands on a border cell
+        for x in range(grid.width):
+            self.assertEqual(grid.data[grid.index(x, 0) - grid.stride], BORDER)
+            self.assertEqual(grid.data[grid.index(x, 1) + grid.stride], BORDER)
+        for y in range(grid.height):
+            self.assertEqual(grid.data[grid.index(0, y) - 1], BORDER)
+            self.assertEqual(grid.data[grid.index(2, y) + 1], BORDER)
+
+    def test_read(self) -> None:
+        self.check_grid(self.read(b"#.O\n..#\n"))
+
+    def test_read_without_final_newline(self) -> None:
+        self.check_grid(self.read(b"#.O\n..#"))
+
+    def test_read_crlf(self) -> None:
+        self.check_grid(self.read(b"#.O\r\n..#\r\n"))
+        self.check_grid(self.read(b"#.O\r\n..#"))
+
+
+if __name__ == '__main__':
+    unittest.main()
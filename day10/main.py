@@ -1,5 +1,10 @@
+import os
+import sys
 from typing import List, Iterator, Tuple, Optional, Dict
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.grid import Grid
+
 
 class Pipe:
     def __init__(self, char: str, start: (int, int), end: (int, int)):
@@ -97,11 +102,37 @@ def traverse_from_start(grid: List[List[str]]) -> List[Tuple[int, int]]:
     return traverse(grid, start, start_prev, end)
 
 
-def part1(filename: str) -> int:
-    with open(filename, "r") as f:
-        lines = list(map(lambda line: list(line.strip()), f.readlines()))
+def pipe_offsets(grid: Grid) -> List[Optional[Tuple[int, int]]]:
+    """The two cell index offsets each pipe connects to, by byte value"""
+    offsets = [None] * 256
+    for pipe in PIPES:
+        offsets[ord(pipe.char)] = tuple(x + y * grid.stride for x, y in (pipe.start, pipe.end))
+    return offsets
+
+
+def loop_from_start(grid: Grid) -> List[int]:
+    """Cell indices of the loop through S, starting at S"""
+    offsets = pipe_offsets(grid)
+    start = grid.data.find(b"S")
+    # Neighbors whose pipes connect back to S; BORDER cells have no pipe
+    connections = [
+        start + d for d in grid.offsets
+        if offsets[grid.data[start + d]] is not None and -d in offsets[grid.data[start + d]]
+    ]
+    assert len(connections) == 2
+
+    path = [start]
+    prev, curr = start, connections[0]
+    while curr != start:
+        path.append(curr)
+        a, b = offsets[grid.data[curr]]
+        prev, curr = curr, curr + a if curr + a != prev else curr + b
 
-    path_len = len(traverse_from_start(lines))
+    return path
+
+
+def part1(filename: str) -> int:
+    path_len = len(loop_from_start(Grid.read(filename)))
 
     return path_len // 2
 
@@ -257,8 +288,29 @@ def part2(filename: str) -> int:
     return (len(grid) * len(grid[0])) - marks - len(path)
 
 
+def enclosed_tiles(path: List[Tuple[int, int]]) -> int:
+    """
+    Counts the tiles enclosed by a closed loop of tile centers, using the
+    shoelace formula for its area and Pick's theorem to remove the boundary
+    """
+    twice_area = 0
+    prev_x, prev_y = path[-1]
+    for x, y in path:
+        twice_area += prev_x * y - x * prev_y
+        prev_x, prev_y = x, y
+
+    # Pick's theorem: A = i + b/2 - 1
+    return (abs(twice_area) - len(path)) // 2 + 1
+
+
+def part2_shoelace(filename: str) -> int:
+    grid = Grid.read(filename)
+
+    return enclosed_tiles([grid.pos(i) for i in loop_from_start(grid)])
+
+
 if __name__ == "__main__":
     p1 = part1("input")
     print(f"Part 1: {p1}")
-    p2 = part2("input")
+    p2 = part2_shoelace("input")
     print(f"Part 2: {p2}")
@@ -1,51 +1,90 @@
-from typing import List, Tuple
+import mmap
+import os
+import sys
+from bisect import bisect_left
+from collections import Counter
+from typing import Iterable, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.fenwick import FenwickTree
 
 def dist1(a: Tuple[int, int], b: Tuple[int, int]) -> int:
     return abs(a[0] - b[0]) + abs(a[1] - b[1])
 
 
-def positions_to_dist_sum(positions: List[Tuple[int, int]]) -> int:
+def axis_dist_sum(coords: Iterable[int]) -> int:
+    """Sum of |a - b| over all pairs, from the sorted coordinates and their prefix sums"""
     s = 0
-    for i, pos1 in enumerate(positions):
-        for j, pos2 in enumerate(positions[i+1:]):
-            s += dist1(pos1, pos2)
+    prefix = 0
+    for i, c in enumerate(sorted(coords)):
+        # c is at least as large as each of the i coordinates before it
+        s += c * i - prefix
+        prefix += c
     return s
 
 
-def add_expansion_to_grid(grid: List[List[str]]) -> None:
-    # Rows
-    y = 0
-    while y < len(grid):
-        row = grid[y]
-        if all(c == "." for c in row):
-            grid.insert(y, ["."] * len(row))
-            y += 1
-        y += 1
+def positions_to_dist_sum(positions: List[Tuple[int, int]]) -> int:
+    # Manhattan distance splits into independent x and y sums
+    return axis_dist_sum(p[0] for p in positions) + axis_dist_sum(p[1] for p in positions)
+
+
+def positions_to_dist_sum_np(positions: List[Tuple[int, int]]) -> int:
+    if np is None:
+        return positions_to_dist_sum(positions)
+    coords = np.sort(np.array(positions, dtype=np.int64).reshape(-1, 2), axis=0)
+    n = coords.shape[0]
+    # The ith smallest coordinate is added i times and subtracted n-1-i times
+    weights = 2 * np.arange(n, dtype=np.int64) - (n - 1)
+    return int((weights @ coords).sum())
 
-    # Columns
-    x = 0
-    while x < len(grid[0]):
-        if all(grid[y][x] == "." for y in range(len(grid))):
-            for row in grid:
-                row.insert(x, ".")
-            x += 1
-        x += 1
 
+def scan_galaxies(filename: str) -> Tuple[List[Tuple[int, int]], List[int], List[int]]:
+    """
+    Memory maps the image and finds the galaxies with bytes.find, without
+    building any per-character objects. Returns the unexpanded galaxy
+    positions and the empty rows and columns.
+    """
+    with open(filename, "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as image:
+            width = image.find(b"\n")
+            if width < 0:
+                width = len(image)
+            stride = width + 1
+            height = (len(image) + 1) // stride
 
-def find_expansion_rows_cols(grid: List[List[str]]) -> Tuple[List[int], List[int]]:
-    rows = []
-    cols = []
-    for y, row in enumerate(grid):
-        if all(c == "." for c in row):
-            rows.append(y)
-    for x, col in enumerate(zip(*grid)):
-        if all(c == "." for c in col):
-            cols.append(x)
-    return rows, cols
+            positions = []
+            occupied_rows = bytearray(height)
+            occupied_cols = bytearray(width)
+            i = image.find(b"#")
+            while i >= 0:
+                y, x = divmod(i, stride)
+                positions.append((x, y))
+                occupied_rows[y] = 1
+                occupied_cols[x] = 1
+                i = image.find(b"#", i + 1)
 
+    exp_rows = [y for y, occupied in enumerate(occupied_rows) if not occupied]
+    exp_cols = [x for x, occupied in enumerate(occupied_cols) if not occupied]
+    return positions, exp_rows, exp_cols
 
-def positions_from_grid(grid: List[List[str]]) -> List[Tuple[int, int]]:
-    return [(x, y) for y, row in enumerate(grid) for x, c in enumerate(row) if c == "#"]
+
+def expansion_shifts(size: int, exp_lines: List[int], factor: int) -> List[int]:
+    """How far each row (or column) moves when the empty ones grow by factor"""
+    shifts = [0] * size
+    shift = 0
+    exp_lines = iter(exp_lines)
+    next_exp = next(exp_lines, size)
+    for i in range(size):
+        shifts[i] = shift
+        if i == next_exp:
+            shift += factor - 1
+            next_exp = next(exp_lines, size)
+    return shifts
 
 
 def add_expansion_to_positions(positions: List[Tuple[int, int]], exp_rows: List[int], exp_cols: List[int], factor: int) -> None:
@@ -70,40 +109,236 @@ def add_expansion_to_positions(positions: List[Tuple[int, int]], exp_rows: List[
     positions[:] = new_positions # Forgot the slice assignment operator in CS1 Midterm 2...
 
 
-def read_positions_p1(filename: str) -> List[Tuple[int, int]]:
-    with open(filename) as f:
-        lines = [list(line.strip()) for line in f.readlines()]
+def read_positions(filename: str, factor: int) -> List[Tuple[int, int]]:
+    positions, exp_rows, exp_cols = scan_galaxies(filename)
+    width = max((p[0] for p in positions), default=-1) + 1
+    height = max((p[1] for p in positions), default=-1) + 1
 
-    add_expansion_to_grid(lines)
+    x_shifts = expansion_shifts(width, exp_cols, factor)
+    y_shifts = expansion_shifts(height, exp_rows, factor)
 
-    return positions_from_grid(lines)
+    return [(x + x_shifts[x], y + y_shifts[y]) for x, y in positions]
+
+
+def read_positions_p1(filename: str) -> List[Tuple[int, int]]:
+    return read_positions(filename, 2)
 
 
 def read_positions_p2(filename: str, factor: int) -> List[Tuple[int, int]]:
-    with open(filename) as f:
-        lines = [list(line.strip()) for line in f.readlines()]
+    return read_positions(filename, factor)
+
+
+def crossings(coords: Iterable[int], empty_lines: List[int]) -> int:
+    """Number of (pair of galaxies, empty line between them) combinations on one axis"""
+    coords = sorted(coords)
+    total = 0
+    for line in empty_lines:
+        before = bisect_left(coords, line)
+        total += before * (len(coords) - before)
+    return total
+
+
+class ExpansionDistances:
+    """
+    The galaxy distance sum is linear in the expansion factor, so after one
+    scan of the image the sum for any factor is O(1)
+    """
+    def __init__(self, positions: List[Tuple[int, int]], exp_rows: List[int], exp_cols: List[int]):
+        # Distance sum with no expansion
+        self.base = positions_to_dist_sum(positions)
+        # Extra distance for every unit each empty row or column grows by
+        self.per_unit = crossings((p[0] for p in positions), exp_cols) + crossings((p[1] for p in positions), exp_rows)
+
+    def __call__(self, factor: int) -> int:
+        return self.base + (factor - 1) * self.per_unit
+
+
+def read_expansion_distances(filename: str) -> ExpansionDistances:
+    return ExpansionDistances(*scan_galaxies(filename))
+
+
+class OccupiedLines:
+    """
+    Segment tree over the lines of one axis. Holds the number of galaxies
+    before each occupied line, with O(log n) range adds to those counts and
+    sums of them over just the occupied lines.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.occupied = [0] * (4 * size)
+        # Sum of galaxies before each occupied line in the node
+        self.before = [0] * (4 * size)
+        # Add still to be pushed down to the node's children
+        self.pending = [0] * (4 * size)
+
+    def _apply(self, node: int, delta: int) -> None:
+        self.before[node] += delta * self.occupied[node]
+        self.pending[node] += delta
+
+    def _push(self, node: int) -> None:
+        if self.pending[node]:
+            self._apply(2 * node, self.pending[node])
+            self._apply(2 * node + 1, self.pending[node])
+            self.pending[node] = 0
+
+    def _pull(self, node: int) -> None:
+        self.occupied[node] = self.occupied[2 * node] + self.occupied[2 * node + 1]
+        self.before[node] = self.before[2 * node] + self.before[2 * node + 1]
+
+    def set_line(self, line: int, occupied: bool, before: int, node: int = 1, lo: int = 0, hi: Optional[int] = None) -> None:
+        hi = self.size if hi is None else hi
+        if hi - lo == 1:
+            self.occupied[node] = int(occupied)
+            self.before[node] = before if occupied else 0
+            return
+        self._push(node)
+        mid = (lo + hi) // 2
+        if line < mid:
+            self.set_line(line, occupied, before, 2 * node, lo, mid)
+        else:
+            self.set_line(line, occupied, before, 2 * node + 1, mid, hi)
+        self._pull(node)
+
+    def add_before(self, start: int, end: int, delta: int, node: int = 1, lo: int = 0, hi: Optional[int] = None) -> None:
+        """Adds delta to the galaxies before each line in [start, end)"""
+        hi = self.size if hi is None else hi
+        if end <= lo or hi <= start:
+            return
+        if start <= lo and hi <= end:
+            self._apply(node, delta)
+            return
+        self._push(node)
+        mid = (lo + hi) // 2
+        self.add_before(start, end, delta, 2 * node, lo, mid)
+        self.add_before(start, end, delta, 2 * node + 1, mid, hi)
+        self._pull(node)
+
+    def query(self, start: int, end: int, node: int = 1, lo: int = 0, hi: Optional[int] = None) -> Tuple[int, int]:
+        """Number of occupied lines in [start, end) and the sum of galaxies before them"""
+        hi = self.size if hi is None else hi
+        if end <= lo or hi <= start:
+            return 0, 0
+        if start <= lo and hi <= end:
+            return self.occupied[node], self.before[node]
+        self._push(node)
+        mid = (lo + hi) // 2
+        occupied_lo, before_lo = self.query(start, end, 2 * node, lo, mid)
+        occupied_hi, before_hi = self.query(start, end, 2 * node + 1, mid, hi)
+        return occupied_lo + occupied_hi, before_lo + before_hi
+
+
+class AxisDistances:
+    """
+    Pairwise distance sums along one axis for a changing set of galaxies.
+
+    dist_sum is the unexpanded sum of |a - b|. rank_dist_sum is the same sum
+    over the ranks of the occupied lines, so that the number of empty lines
+    crossed by all pairs is dist_sum - rank_dist_sum.
+    """
+    def __init__(self, size: int):
+        self.size = size
+        self.counts = FenwickTree(size)
+        self.coord_sums = FenwickTree(size)
+        self.lines = OccupiedLines(size)
+        self.n = 0
+        self.dist_sum = 0
+        self.rank_dist_sum = 0
+
+    def _deltas(self, c: int) -> Tuple[int, int]:
+        """Change to (dist_sum, rank_dist_sum) from adding a galaxy at c to the others"""
+        before = self.counts.prefix(c)
+        after = self.n - self.counts.prefix(c + 1)
+        dist_delta = (
+            c * before - self.coord_sums.prefix(c)
+            + (self.coord_sums.total - self.coord_sums.prefix(c + 1)) - c * after
+        )
+
+        # rank_dist_sum is the sum over occupied lines L of before(L) * (n - before(L)).
+        # Lines up to c keep their before count but n grows, lines past c gain one before.
+        occupied_to_c, before_to_c = self.lines.query(0, c + 1)
+        occupied_past_c, before_past_c = self.lines.query(c + 1, self.size)
+        rank_delta = before_to_c + self.n * occupied_past_c - before_past_c
+        if self.counts.prefix(c + 1) == self.counts.prefix(c):
+            # c becomes a newly occupied line
+            rank_delta += before * (self.n + 1 - before)
+        return dist_delta, rank_delta
+
+    def add(self, c: int) -> None:
+        dist_delta, rank_delta = self._deltas(c)
+        self.dist_sum += dist_delta
+        self.rank_dist_sum += rank_delta
+
+        if self.counts.prefix(c + 1) == self.counts.prefix(c):
+            self.lines.set_line(c, True, self.counts.prefix(c))
+        self.lines.add_before(c + 1, self.size, 1)
+        self.counts.add(c, 1)
+        self.coord_sums.add(c, c)
+        self.n += 1
+
+    def remove(self, c: int) -> None:
+        if self.counts.prefix(c + 1) == self.counts.prefix(c):
+            raise KeyError(c)
+        self.counts.add(c, -1)
+        self.coord_sums.add(c, -c)
+        self.lines.add_before(c + 1, self.size, -1)
+        self.n -= 1
+        if self.counts.prefix(c + 1) == self.counts.prefix(c):
+            self.lines.set_line(c, False, 0)
+
+        # Undo what adding it back would do
+        dist_delta, rank_delta = self._deltas(c)
+        self.dist_sum -= dist_delta
+        self.rank_dist_sum -= rank_delta
+
+    def expanded_dist_sum(self, factor: int) -> int:
+        return self.dist_sum + (factor - 1) * (self.dist_sum - self.rank_dist_sum)
+
+
+class DynamicGalaxies:
+    """
+    Keeps the total pairwise galaxy distance up to date as galaxies are
+    added and removed in an image of the given size, in O(log size) per
+    change. Empty rows and columns are those of the current galaxy set.
+    """
+    def __init__(self, width: int, height: int):
+        self.xs = AxisDistances(width)
+        self.ys = AxisDistances(height)
+        self.galaxies = Counter()
 
-    positions = positions_from_grid(lines)
+    def add(self, x: int, y: int) -> None:
+        if not (0 <= x < self.xs.size and 0 <= y < self.ys.size):
+            raise IndexError(f"Galaxy {(x, y)} is outside the image")
+        self.xs.add(x)
+        self.ys.add(y)
+        self.galaxies[(x, y)] += 1
 
-    exp_rows, exp_cols = find_expansion_rows_cols(lines)
+    def remove(self, x: int, y: int) -> None:
+        # Check first, so the two axes always describe the same galaxies
+        if self.galaxies[(x, y)] == 0:
+            del self.galaxies[(x, y)]
+            raise KeyError((x, y))
+        self.galaxies[(x, y)] -= 1
+        if self.galaxies[(x, y)] == 0:
+            del self.galaxies[(x, y)]
+        self.xs.remove(x)
+        self.ys.remove(y)
 
-    add_expansion_to_positions(positions, exp_rows, exp_cols, factor)
+    def __len__(self) -> int:
+        return self.xs.n
 
-    return positions
+    def dist_sum(self, factor: int) -> int:
+        return self.xs.expanded_dist_sum(factor) + self.ys.expanded_dist_sum(factor)
 
 
 def part1(filename: str) -> int:
-    positions = read_positions_p1(filename)
-    return positions_to_dist_sum(positions)
+    return read_expansion_distances(filename)(2)
 
 
 def part2(filename: str) -> int:
-    positions = read_positions_p2(filename, 1000000)
-    return positions_to_dist_sum(positions)
+    return read_expansion_distances(filename)(1000000)
 
 
 if __name__ == "__main__":
-    p1 = part1("input")
-    print(f"Part 1: {p1}")
-    p2 = part2("input")
-    print(f"Part 2: {p2}")
+    distances = read_expansion_distances("input")
+    print(f"Part 1: {distances(2)}")
+    print(f"Part 2: {distances(1000000)}")
@@ -0,0 +1,73 @@
+import random
+import unittest
+
+from main import DynamicGalaxies, ExpansionDistances, dist1
+
+
+def brute_force_dist_sum(positions, factor):
+    """Expands every empty row and column by factor, then sums dist1 over every pair"""
+    empty_rows = {y for y in range(max((y for _, y in positions), default=0)) if all(p[1] != y for p in positions)}
+    empty_cols = {x for x in range(max((x for x, _ in positions), default=0)) if all(p[0] != x for p in positions)}
+    expanded = [
+        (x + (factor - 1) * sum(1 for c in empty_cols if c < x), y + (factor - 1) * sum(1 for r in empty_rows if r < y))
+        for x, y in positions
+    ]
+    return sum(dist1(a, b) for i, a in enumerate(expanded) for b in expanded[i + 1:])
+
+
+def random_positions(rng, count, width, height):
+    return [(rng.randrange(width), rng.randrange(height)) for _ in range(count)]
+
+
+class TestExpansionDistances(unittest.TestCase):
+    def test_matches_brute_force(self) -> None:
+        rng = random.Random(12)
+        for _ in range(50):
+            positions = random_positions(rng, rng.randrange(1, 15), 12, 9)
+            exp_rows = [y for y in range(9) if all(p[1] != y for p in positions)]
+            exp_cols = [x for x in range(12) if all(p[0] != x for p in positions)]
+            distances = ExpansionDistances(positions, exp_rows, exp_cols)
+            for factor in 1, 2, 10, 1_000_000:
+                self.assertEqual(distances(factor), brute_force_dist_sum(positions, factor))
+
+
+class TestDynamicGalaxies(unittest.TestCase):
+    def test_matches_brute_force(self) -> None:
+        rng = random.Random(11)
+        for _ in range(20):
+            galaxies = DynamicGalaxies(12, 9)
+            positions = []
+            for _ in range(60):
+                if positions and rng.random() < 0.4:
+                    x, y = positions.pop(rng.randrange(len(positions)))
+                    galaxies.remove(x, y)
+                else:
+                    pos = (rng.randrange(12), rng.randrange(9))
+                    positions.append(pos)
+                    galaxies.add(*pos)
+                for factor in 1, 2, 10:
+                    self.assertEqual(galaxies.dist_sum(factor), brute_force_dist_sum(positions, factor))
+
+    def test_remove_missing_galaxy(self) -> None:
+        galaxies = DynamicGalaxies(3, 3)
+        galaxies.add(0, 0)
+        galaxies.add(1, 1)
+        before = galaxies.dist_sum(2)
+        # Both coordinates exist on their own axes, but not as one galaxy
+        with self.assertRaises(KeyError):
+            galaxies.remove(0, 1)
+        with self.assertRaises(KeyError):
+            galaxies.remove(0, 2)
+        self.assertEqual(galaxies.xs.n, 2)
+        self.assertEqual(galaxies.ys.n, 2)
+        self.assertEqual(galaxies.dist_sum(2), before)
+
+    def test_add_outside_image(self) -> None:
+        galaxies = DynamicGalaxies(3, 3)
+        with self.assertRaises(IndexError):
+            galaxies.add(3, 0)
+        self.assertEqual(len(galaxies), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,16 +1,61 @@
-from typing import List, Tuple, Dict
+import heapq
+import os
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import accumulate
+from typing import Hashable, List, Optional, Tuple, Dict
 
 
-def hole_filling_combinations(terrain: List[str], contig_seqs: List[int], memo: Dict[Tuple[int, int], int]) -> int:
+class LRUCache:
+    """A dict with a maximum size that evicts the least recently used entry, counting hits and misses"""
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[int]:
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: int) -> None:
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+# Shared by every row of every file in the process, since the memo keys
+# are the remaining terrain and seqs themselves
+SHARED_MEMO = LRUCache(1_000_000)
+
+
+def hole_filling_combinations(terrain: str, contig_seqs: List[int], memo: Dict[Tuple[str, Tuple[int, ...]], int]) -> int:
     """
     Given a list of must-fill and can-fill holes, returns the number of ways to fill them.
     The holes are assumed to be in ascending order.
+    memo can be a dict or an LRUCache, and can be shared between rows.
     """
-    def memo_set_get(terrain: List[str], contig_seqs: List[int]) -> int:
-        key = (len(terrain), len(contig_seqs))
-        if key not in memo:
-            memo[key] = hole_filling_combinations(terrain, contig_seqs, memo)
-        return memo[key]
+    def memo_set_get(terrain: str, contig_seqs: List[int]) -> int:
+        key = (terrain, tuple(contig_seqs))
+        ways = memo.get(key)
+        if ways is None:
+            ways = hole_filling_combinations(terrain, contig_seqs, memo)
+            memo[key] = ways
+        return ways
 
     if len(contig_seqs) == 0:
         for c in terrain:
@@ -71,6 +116,44 @@ def hole_filling_combinations(terrain: List[str], contig_seqs: List[int], memo:
         raise Exception(f"Unexpected terrain char {terrain[i]}")
 
 
+def count_arrangements(terrain: str, contig_seqs: List[int]) -> int:
+    """
+    Iterative version of hole_filling_combinations.
+
+    ways[g] is the number of ways to fill terrain[i:] with contig_seqs[g:].
+    It's built from the end of the terrain backwards. Position i reads the
+    rows for i+1 up to i+max(contig_seqs)+1, so only max(contig_seqs)+2 rows
+    are kept, in a ring. The table takes O(len(contig_seqs) * max(contig_seqs))
+    memory rather than O(len(contig_seqs) * len(terrain)), though the '.'
+    prefix counts still take O(len(terrain)).
+    """
+    n = len(terrain)
+    seq_count = len(contig_seqs)
+
+    # dots[i] is the number of '.' in terrain[:i]
+    dots = [0] * (n + 1)
+    for i, c in enumerate(terrain):
+        dots[i+1] = dots[i] + (c == ".")
+
+    depth = max(contig_seqs, default=0) + 2
+    rows = [[0] * (seq_count + 1) for _ in range(depth)]
+    rows[n % depth][seq_count] = 1
+    for i in range(n - 1, -1, -1):
+        ways = rows[i % depth]
+        next_ways = rows[(i + 1) % depth]
+        can_skip = terrain[i] != "#"
+        for g in range(seq_count + 1):
+            w = next_ways[g] if can_skip else 0
+            if g < seq_count and terrain[i] != ".":
+                seq_end = i + contig_seqs[g]
+                # No '.' inside the sequence, and not followed directly by a '#'
+                if seq_end <= n and dots[seq_end] == dots[i] and (seq_end == n or terrain[seq_end] != "#"):
+                    w += rows[min(seq_end + 1, n) % depth][g+1]
+            ways[g] = w
+
+    return rows[0][0]
+
+
 def line_to_terrain_and_contig_steps(line: str) -> Tuple[List[str], List[int]]:
     terrain, seq_str = line.split(" ")
     return (terrain, [int(x) for x in seq_str.split(",")])
@@ -82,7 +165,7 @@ def part1(filename: str) -> int:
 
     inputs = [line_to_terrain_and_contig_steps(line) for line in lines]
 
-    return sum(hole_filling_combinations(terrain, contig_seqs, {}) for terrain, contig_seqs in inputs)
+    return sum(count_arrangements(terrain, contig_seqs) for terrain, contig_seqs in inputs)
 
 
 def unfold_terrain(terrain: str) -> List[str]:
@@ -93,6 +176,83 @@ def unfold_seqs(seqs: List[int]) -> List[int]:
     return seqs*5
 
 
+def segment_transfer(segment: str, contig_seqs: List[int], start_seq: int, run: int) -> Dict[Tuple[int, int], int]:
+    """
+    Number of ways to fill segment, starting part way through the repeated
+    contig_seqs at index start_seq with a run of run '#'s already placed.
+    Keyed by (seqs completed, length of the run at the end of the segment).
+    """
+    states = {(0, run): 1}
+    for c in segment:
+        new_states = defaultdict(int)
+        for (seqs_done, r), ways in states.items():
+            seq_len = contig_seqs[(start_seq + seqs_done) % len(contig_seqs)]
+            if c != "#":
+                if r == 0:
+                    new_states[(seqs_done, 0)] += ways
+                elif r == seq_len:
+                    new_states[(seqs_done + 1, 0)] += ways
+            if c != "." and r < seq_len:
+                new_states[(seqs_done, r + 1)] += ways
+        states = new_states
+    return states
+
+
+def unfolded_combinations(terrain: str, contig_seqs: List[int], factor: int) -> int:
+    """
+    hole_filling_combinations of the terrain and seqs unfolded factor times,
+    without building the unfolded terrain.
+
+    Each copy of the terrain (plus its '?' joiner) moves a state of
+    (seqs completed, length of the current '#' run) to new states. A copy's
+    transitions only depend on where in the repeated seqs it starts, so they
+    are worked out once and reused for every copy. Each copy then costs one
+    pass over the live states. States that can no longer fit their remaining
+    seqs are dropped, but the ones left still spread over how far ahead or
+    behind the seqs can be after each copy, which grows linearly with factor,
+    so the total cost is O(factor**2) passes over a copy's transitions.
+    """
+    seq_count = len(contig_seqs)
+    total = seq_count * factor
+    # spans[i] is the length of contig_seqs[:i], each followed by one '.'
+    spans = [0] + list(accumulate(seq + 1 for seq in contig_seqs))
+
+    def span_to(seqs_done: int) -> int:
+        cycles, offset = divmod(seqs_done, seq_count)
+        return cycles * spans[-1] + spans[offset]
+
+    transfers = {}
+    states = {(0, 0): 1}
+    for copy in range(factor):
+        joined = copy < factor - 1
+        segment = terrain + "?" if joined else terrain
+        chars_left = max((factor - copy - 1) * (len(terrain) + 1) - 1, 0)
+
+        new_states = defaultdict(int)
+        for (seqs_done, run), ways in states.items():
+            start_seq = seqs_done % seq_count
+            key = (start_seq, run, joined)
+            if key not in transfers:
+                transfers[key] = [
+                    (done, new_run, span_to(start_seq + done), transfer_ways)
+                    for (done, new_run), transfer_ways in segment_transfer(segment, contig_seqs, start_seq, run).items()
+                ]
+            # Span of the seqs from the start of this pass through contig_seqs to the end
+            span_left = span_to(total) - span_to(seqs_done - start_seq)
+            for done, new_run, done_span, transfer_ways in transfers[key]:
+                new_done = seqs_done + done
+                if new_done > total or (new_done == total and new_run > 0):
+                    continue
+                # Drop states that can't fit their remaining seqs in the characters left
+                if new_done < total and span_left - done_span - 1 - new_run > chars_left:
+                    continue
+                new_states[(new_done, new_run)] += ways * transfer_ways
+        states = new_states
+
+    # Either everything is done, or the last seq runs right up to the end
+    return states.get((total, 0), 0) + states.get((total - 1, contig_seqs[-1]), 0)
+
+
 def part2(filename: str) -> int:
     with open(filename) as f:
         lines = [line.strip() for line in f.readlines()]
@@ -100,7 +260,68 @@ def part2(filename: str) -> int:
     inputs = [line_to_terrain_and_contig_steps(line) for line in lines]
     inputs = [(unfold_terrain(terrain), unfold_seqs(contig_seqs)) for terrain, contig_seqs in inputs]
 
-    return sum(hole_filling_combinations(terrain, contig_seqs, {}) for terrain, contig_seqs in inputs)
+    return sum(count_arrangements(terrain, contig_seqs) for terrain, contig_seqs in inputs)
+
+
+def part2_factor(filename: str, factor: int) -> int:
+    with open(filename) as f:
+        lines = [line.strip() for line in f.readlines()]
+
+    inputs = [line_to_terrain_and_contig_steps(line) for line in lines]
+
+    return sum(unfolded_combinations(terrain, contig_seqs, factor) for terrain, contig_seqs in inputs)
+
+
+def part2_shared_memo(filename: str, memo: LRUCache = SHARED_MEMO) -> int:
+    with open(filename) as f:
+        lines = [line.strip() for line in f.readlines()]
+
+    inputs = [line_to_terrain_and_contig_steps(line) for line in lines]
+    inputs = [(unfold_terrain(terrain), unfold_seqs(contig_seqs)) for terrain, contig_seqs in inputs]
+
+    return sum(hole_filling_combinations(terrain, contig_seqs, memo) for terrain, contig_seqs in inputs)
+
+
+def row_cost(terrain: str, contig_seqs: List[int]) -> int:
+    """Rough relative cost of counting a row, for balancing work between processes"""
+    return len(terrain) * len(contig_seqs) * (terrain.count("?") + 1)
+
+
+def balanced_chunks(rows: List[Tuple[str, List[int]]], chunk_count: int) -> List[List[Tuple[int, str, List[int]]]]:
+    """
+    Splits rows into chunks of about equal total cost, giving each row (most
+    expensive first) to the cheapest chunk so far. Rows keep their index.
+    """
+    chunks = [[] for _ in range(chunk_count)]
+    loads = [(0, i) for i in range(chunk_count)]
+    by_cost = sorted(range(len(rows)), key=lambda i: row_cost(*rows[i]), reverse=True)
+    for i in by_cost:
+        load, chunk = heapq.heappop(loads)
+        chunks[chunk].append((i, *rows[i]))
+        heapq.heappush(loads, (load + row_cost(*rows[i]), chunk))
+    return [chunk for chunk in chunks if chunk]
+
+
+def count_chunk(chunk: List[Tuple[int, str, List[int]]]) -> List[Tuple[int, int]]:
+    # Runs in a worker process, so SHARED_MEMO is that worker's own memo
+    return [(i, hole_filling_combinations(terrain, contig_seqs, SHARED_MEMO)) for i, terrain, contig_seqs in chunk]
+
+
+def part2_parallel(filename: str, workers: Optional[int] = None, chunks_per_worker: int = 4) -> int:
+    with open(filename) as f:
+        lines = [line.strip() for line in f.readlines()]
+
+    inputs = [line_to_terrain_and_contig_steps(line) for line in lines]
+    inputs = [(unfold_terrain(terrain), unfold_seqs(contig_seqs)) for terrain, contig_seqs in inputs]
+
+    workers = workers or os.cpu_count() or 1
+    counts = [0] * len(inputs)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for results in executor.map(count_chunk, balanced_chunks(inputs, workers * chunks_per_worker)):
+            for i, count in results:
+                counts[i] = count
+
+    return sum(counts)
 
 
 if __name__ == '__main__':
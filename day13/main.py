@@ -1,5 +1,5 @@
 import itertools
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional, Tuple
 
 
 def identity_dict_rows(grid: List[str]) -> Dict[int, List[int]]:
@@ -161,25 +161,71 @@ def find_row_or_col_flip_approx(grid: List[str]) -> int:
     return col_flip + 1
 
 
-def read_grids(filename: str) -> List[List[str]]:
+def encode_grid(grid: List[str]) -> Tuple[List[int], List[int]]:
+    """Encodes each row and each column as an int, with a set bit for each '#'"""
+    rows = [0] * len(grid)
+    cols = [0] * len(grid[0])
+    for y, row in enumerate(grid):
+        for x, c in enumerate(row):
+            if c == "#":
+                rows[y] |= 1 << x
+                cols[x] |= 1 << y
+    return rows, cols
+
+
+def find_mirror(lines: List[int], smudges: int) -> Optional[int]:
+    """
+    Returns the number of lines before the mirror that reflects lines with
+    exactly smudges differing cells, if there is one
+    """
+    for pos in range(1, len(lines)):
+        diffs = 0
+        for i in range(min(pos, len(lines) - pos)):
+            diffs += (lines[pos - 1 - i] ^ lines[pos + i]).bit_count()
+            if diffs > smudges:
+                break
+        if diffs == smudges:
+            return pos
+    return None
+
+
+def mirror_score(rows: List[int], cols: List[int], smudges: int) -> int:
+    row_flip_opt = find_mirror(rows, smudges)
+    if row_flip_opt is not None:
+        return row_flip_opt * 100
+
+    col_flip = find_mirror(cols, smudges)
+    assert col_flip is not None, "No flip found"
+    return col_flip
+
+
+def iter_patterns(filename: str) -> Iterator[Tuple[List[int], List[int]]]:
+    """Yields the encoded rows and columns of each pattern as the file is read"""
     with open(filename) as f:
-        lines = [l.strip() for l in f.readlines()]
+        lines = (l.strip() for l in f)
+        for is_divider, pattern in itertools.groupby(lines, lambda l: l == ""):
+            if not is_divider:
+                yield encode_grid(list(pattern))
+
 
-    return [list(v) for is_d, v in itertools.groupby(lines, lambda l: l == "") if not is_d]
+def both_parts(filename: str) -> Tuple[int, int]:
+    """Solves both parts in a single pass over the file"""
+    p1, p2 = 0, 0
+    for rows, cols in iter_patterns(filename):
+        p1 += mirror_score(rows, cols, 0)
+        p2 += mirror_score(rows, cols, 1)
+    return p1, p2
 
 
 def part1(filename: str) -> int:
-    grids = read_grids(filename)
-    return sum(find_row_or_col_flip_exact(g) for g in grids)
+    return sum(mirror_score(rows, cols, 0) for rows, cols in iter_patterns(filename))
 
 
 def part2(filename: str) -> int:
-    grids = read_grids(filename)
-    return sum(find_row_or_col_flip_approx(g) for g in grids)
+    return sum(mirror_score(rows, cols, 1) for rows, cols in iter_patterns(filename))
 
 
 if __name__ == '__main__':
-    p1 = part1('input')
+    p1, p2 = both_parts('input')
     print(f'Part 1: {p1}')
-    p2 = part2('input')
     print(f'Part 2: {p2}')
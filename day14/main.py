@@ -1,85 +1,152 @@
-from typing import List
-
-
-def shift_dir(grid: List[List[str]], dir: (int, int)):
-    for y in range(len(grid)):
-        if dir[1] > 0:
-            y = len(grid) - 1 - y
-
-        for x in range(len(grid[y])):
-            if dir[0] > 0:
-                x = len(grid[y]) - 1 - x
-
-            if grid[y][x] == "O":
-                step = dir[0] + dir[1]
-                if dir[1] != 0:
-                    start = y
-                    if dir[1] > 0:
-                        end = len(grid)
+import hashlib
+import os
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.grid import Grid
+
+
+# N W S E
+CYCLE = [(0, -1), (-1, 0), (0, 1), (1, 0)]
+
+ROUND = ord("O")
+EMPTY = ord(".")
+CUBE = ord("#")
+
+
+class TiltEngine:
+    """
+    Tilts a platform by counting the round rocks in each run of cells
+    between cube rocks and refilling the run, instead of moving rocks
+    one cell at a time. The runs are found once per direction and stored
+    as slices of the grid data, ordered so that rocks roll to the start.
+    With NumPy, all the runs for a direction are refilled at once.
+    """
+    def __init__(self, grid: Grid):
+        self.grid = grid
+        self.segments = {dir: [] for dir in CYCLE}
+        for (x_step, y_step) in CYCLE:
+            step = x_step + y_step * grid.stride
+            if y_step == 0:
+                lines = [[grid.index(x, y) for x in range(grid.width)] for y in range(grid.height)]
+            else:
+                lines = [[grid.index(x, y) for y in range(grid.height)] for x in range(grid.width)]
+            for line in lines:
+                # Order the line so rocks roll towards its start
+                if step > 0:
+                    line.reverse()
+                run = []
+                for i in line + [None]:
+                    if i is None or grid.data[i] == CUBE:
+                        if run:
+                            self.segments[(x_step, y_step)].append(slice(run[0], run[-1] - step, -step))
+                        run = []
                     else:
-                        end = -1
-                else:
-                    start = x
-                    if dir[0] > 0:
-                        end = len(grid[y])
-                    else:
-                        end = -1
-                for move_pos in range(start+step, end, step):
-                    if dir[0] != 0:
-                        new_y = y
-                        prev_y = y
-                        new_x = move_pos
-                        prev_x = move_pos - step
-                    else:
-                        new_y = move_pos
-                        prev_y = move_pos - step
-                        new_x = x
-                        prev_x = x
-
-                    if grid[new_y][new_x] == ".":
-                        grid[new_y][new_x] = "O"
-                        grid[prev_y][prev_x] = "."
-                    else:
-                        break
-
-
-def calculate_load(grid: List[List[str]]) -> int:
-    return sum(len(grid) - y for y in range(len(grid)) for x in range(len(grid[y])) if grid[y][x] == "O")
-
-
-def read_grid(filename: str) -> List[List[str]]:
-    with open(filename) as f:
-        return [list(line.strip()) for line in f.readlines()]
+                        run.append(i)
+        self.fills = {}
+
+        if np is not None:
+            # A view that writes straight into grid.data
+            self.cells = np.frombuffer(grid.data, dtype=np.uint8)
+            # Per direction: every non cube cell in run order, which run it's in, and its position in the run
+            self.run_tables = {}
+            for dir, segments in self.segments.items():
+                order = [range(s.start, s.stop, s.step) for s in segments]
+                self.run_tables[dir] = (
+                    np.fromiter((i for r in order for i in r), dtype=np.int64),
+                    np.repeat(np.arange(len(order)), [len(r) for r in order]),
+                    np.fromiter((p for r in order for p in range(len(r))), dtype=np.int64),
+                )
+
+    def fill(self, length: int, rocks: int) -> bytes:
+        key = (length, rocks)
+        if key not in self.fills:
+            self.fills[key] = b"O" * rocks + b"." * (length - rocks)
+        return self.fills[key]
+
+    def tilt(self, dir: (int, int)) -> None:
+        if np is not None:
+            order, run_ids, run_pos = self.run_tables[dir]
+            rocks = np.bincount(run_ids, weights=self.cells[order] == ROUND, minlength=len(self.segments[dir]))
+            self.cells[order] = np.where(run_pos < rocks[run_ids], ROUND, EMPTY)
+            return
+
+        data = self.grid.data
+        for segment in self.segments[dir]:
+            cells = data[segment]
+            data[segment] = self.fill(len(cells), cells.count(b"O"))
+
+    def spin(self) -> None:
+        for dir in CYCLE:
+            self.tilt(dir)
+
+
+def calculate_load(grid: Grid) -> int:
+    return sum((grid.height - y) * row.tobytes().count(b"O") for y, row in enumerate(grid.rows()))
 
 
 def part1(filename: str) -> int:
-    grid = read_grid(filename)
-    shift_dir(grid, (0, -1))
+    grid = Grid.read(filename)
+    TiltEngine(grid).tilt((0, -1))
     return calculate_load(grid)
 
 
-def part2(filename: str) -> int:
-    grid = read_grid(filename)
-    # N W S E
-    cycle = [(0, -1), (-1, 0), (0, 1), (1, 0)]
-
-    prev_grids = {} # grid_str -> cycle#
-    c = 0
-    limit = 1000000000
-    while c < limit:
-        for dir in cycle:
-            shift_dir(grid, dir)
-        grid_str = "\n".join("".join(row) for row in grid)
-        if grid_str in prev_grids:
-            equal_cycle = prev_grids[grid_str]
-            delta = c - equal_cycle
-            remaining_cycles = 1000000000 - 1 - c
-            limit = c + (remaining_cycles % delta) + 1
-        else:
-            prev_grids[grid_str] = c
-        c += 1
+class SpinCycles:
+    """
+    Spins a platform until its state repeats, recording the north load after
+    every cycle, so the load after any number of cycles is an O(1) lookup.
+
+    Seen states are kept as 16 byte digests. The full platform is only
+    stored every checkpoint_every cycles, and is used to rebuild an earlier
+    state to confirm a repeated digest isn't a collision.
+    """
+    def __init__(self, grid: Grid, checkpoint_every: int = 1000):
+        self.engine = TiltEngine(grid)
+        self.checkpoint_every = checkpoint_every
+        self.checkpoints = {0: bytes(grid.data)}
+        # Load after each number of cycles, starting from 0
+        self.loads = [calculate_load(grid)]
+        seen = {self.digest(): 0}
+        while True:
+            self.engine.spin()
+            c = len(self.loads)
+            self.loads.append(calculate_load(grid))
+            if c % checkpoint_every == 0:
+                self.checkpoints[c] = bytes(grid.data)
+
+            digest = self.digest()
+            if digest in seen and self.state_after(seen[digest]) == grid.data:
+                self.cycle_start = seen[digest]
+                self.period = c - self.cycle_start
+                break
+            seen[digest] = c
+
+    def digest(self) -> bytes:
+        return hashlib.blake2b(self.engine.grid.data, digest_size=16).digest()
+
+    def state_after(self, cycles: int) -> bytes:
+        """The platform after cycles spins (up to the end of the first period), replayed from a checkpoint"""
+        start = cycles - cycles % self.checkpoint_every
+        grid = self.engine.grid
+        replay = Grid(bytearray(self.checkpoints[start]), grid.width, grid.height, grid.start)
+        engine = TiltEngine(replay)
+        for _ in range(cycles - start):
+            engine.spin()
+        return bytes(replay.data)
+
+    def load_after(self, cycles: int) -> int:
+        if cycles >= self.cycle_start:
+            cycles = self.cycle_start + (cycles - self.cycle_start) % self.period
+        return self.loads[cycles]
 
-    return calculate_load(grid)
+
+def part2(filename: str) -> int:
+    return SpinCycles(Grid.read(filename)).load_after(1000000000)
 
 
 if __name__ == "__main__":
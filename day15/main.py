@@ -1,4 +1,16 @@
-from typing import List, Optional, Tuple
+import mmap
+import os
+import sys
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.fenwick import FenwickTree
 
 
 def read_steps(filename: str) -> List[str]:
@@ -8,18 +20,54 @@ def read_steps(filename: str) -> List[str]:
     return line.split(",")
 
 
-def HASH(s: str, cv: int = 0):
-    if len(s) == 0:
-        return cv
+# HASH_STEPS[cv * 256 + c] is the current value after adding character c to cv
+HASH_STEPS = [((cv + c) * 17) % 256 for cv in range(256) for c in range(256)]
+
+
+def HASH(s: Union[str, bytes], cv: int = 0):
+    if isinstance(s, str):
+        s = s.encode()
+    for c in s:
+        cv = HASH_STEPS[cv * 256 + c]
+    return cv
+
+
+def hash_steps(sequence: bytes) -> List[int]:
+    """HASH of every comma separated step, in a single pass over the sequence"""
+    hashes = []
+    cv = 0
+    for c in sequence.strip():
+        if c == 44: # ','
+            hashes.append(cv)
+            cv = 0
+        else:
+            cv = HASH_STEPS[cv * 256 + c]
+    hashes.append(cv)
+    return hashes
+
+
+def hash_steps_np(sequence: bytes) -> "np.ndarray":
+    """hash_steps over a matrix of the steps padded to the same length, one column at a time"""
+    if np is None:
+        return hash_steps(sequence)
+    steps = sequence.strip().split(b",")
+    width = max(len(step) for step in steps)
+    chars = np.frombuffer(b"".join(step.ljust(width, b"\0") for step in steps), dtype=np.uint8).reshape(len(steps), width)
+    lengths = np.array([len(step) for step in steps])
+
+    cv = np.zeros(len(steps), dtype=np.int64)
+    for i in range(width):
+        cv = np.where(i < lengths, ((cv + chars[:, i]) * 17) % 256, cv)
+    return cv
+
 
-    cv += ord(s[0])
-    cv *= 17
-    cv %= 256
-    return HASH(s[1:], cv)
+@lru_cache(maxsize=4096)
+def label_box(label: str) -> int:
+    return HASH(label)
 
 
 def part1(filename: str) -> int:
-    return sum(HASH(step) for step in read_steps(filename))
+    return sum(HASH(step) for step in iter_steps(filename))
 
 
 def parse_step(step: str) -> (str, str, Optional[int]):
@@ -35,27 +83,140 @@ def focusing_power(box_num: int, lenses: List[Tuple[str, int]]) -> int:
     return sum((1+box_num)*(slot+1)*focal_len for slot, (_, focal_len) in enumerate(lenses))
 
 
-def part2(filename: str) -> int:
-    steps = [parse_step(step) for step in read_steps(filename)]
-
-    boxes = [[] for _ in range(256)]
-    for label, op, fl in steps:
-        box = HASH(label)
+class Box:
+    """
+    The lenses in one box, as an insertion ordered dict of label ->
+    (position, focal_len) for O(1) lookups, upserts and removals.
+
+    Positions only grow, so Fenwick trees over them give the slot of a lens
+    and the total focal length after it in O(log n), which is what's needed
+    to keep the box's focusing power up to date when a lens is removed.
+    """
+    def __init__(self, box_num: int):
+        self.box_num = box_num
+        self.lenses: Dict[str, Tuple[int, int]] = {}
+        self.reset_positions()
+
+    def reset_positions(self) -> None:
+        """Renumbers the lenses from 0, so the trees only grow with the lenses in the box"""
+        self.positions = FenwickTree(0)
+        self.focal_lens = FenwickTree(0)
+        self.power = 0
+        lenses = self.lenses
+        self.lenses = {}
+        for label, (_, focal_len) in lenses.items():
+            self.upsert(label, focal_len)
+
+    def upsert(self, label: str, focal_len: int) -> int:
+        """Returns the change in focusing power"""
+        if label in self.lenses:
+            pos, old_focal_len = self.lenses[label]
+            self.lenses[label] = (pos, focal_len)
+            self.focal_lens.add(pos, focal_len - old_focal_len)
+            delta = (1 + self.box_num) * (self.positions.prefix(pos) + 1) * (focal_len - old_focal_len)
+        else:
+            self.lenses[label] = (self.positions.size, focal_len)
+            self.positions.append(1)
+            self.focal_lens.append(focal_len)
+            delta = (1 + self.box_num) * len(self.lenses) * focal_len
+        self.power += delta
+        return delta
+
+    def remove(self, label: str) -> int:
+        """Returns the change in focusing power"""
+        if label not in self.lenses:
+            return 0
+        pos, focal_len = self.lenses.pop(label)
+        slot = self.positions.prefix(pos) + 1
+        # Every lens after this one moves forward a slot
+        focal_after = self.focal_lens.total - self.focal_lens.prefix(pos + 1)
+        self.positions.add(pos, -1)
+        self.focal_lens.add(pos, -focal_len)
+        delta = -(1 + self.box_num) * (slot * focal_len + focal_after)
+        self.power += delta
+
+        if self.positions.size > 2 * len(self.lenses) + 16:
+            self.reset_positions()
+        return delta
+
+
+class Boxes:
+    """All 256 boxes, with the total focusing power kept up to date after each step"""
+    def __init__(self):
+        self.boxes = [Box(box_num) for box_num in range(256)]
+        self.focusing_power = 0
+
+    def apply(self, label: str, op: str, fl: Optional[int]) -> None:
+        box = self.boxes[label_box(label)]
         if op == "=":
-            cur_pos = next((i for i, (l, f) in enumerate(boxes[box]) if l == label), None)
-            if cur_pos is not None:
-                boxes[box][cur_pos] = (label, fl)
-            else:
-                boxes[box].append((label, fl))
+            self.focusing_power += box.upsert(label, fl)
         else:
             assert op == "-"
-            boxes[box] = [b for b in boxes[box] if b[0] != label]
+            self.focusing_power += box.remove(label)
+
+
+def focusing_powers(steps: Iterable[Tuple[str, str, Optional[int]]]) -> Iterator[int]:
+    """Total focusing power after each step"""
+    boxes = Boxes()
+    for step in steps:
+        boxes.apply(*step)
+        yield boxes.focusing_power
+
+
+def part2(filename: str) -> int:
+    boxes = Boxes()
+    for step in iter_steps(filename):
+        boxes.apply(*parse_step_bytes(step))
+
+    return boxes.focusing_power
+
+
+def iter_steps(filename: str) -> Iterator[bytes]:
+    """
+    Yields each step of the initialization sequence from a memory map of the
+    file, so only the current step is ever copied into memory. Like strip()
+    and split(",") on the first line, except empty steps are skipped.
+    """
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as sequence:
+            end = sequence.find(b"\n")
+            if end < 0:
+                end = len(sequence)
+            start = 0
+            while start < end and sequence[start] in b" \t\r":
+                start += 1
+            while end > start and sequence[end - 1] in b" \t\r":
+                end -= 1
+            while start <= end:
+                comma = sequence.find(b",", start, end)
+                if comma < 0:
+                    comma = end
+                if comma > start:
+                    yield sequence[start:comma]
+                start = comma + 1
+
+
+def parse_step_bytes(step: bytes) -> Tuple[bytes, str, Optional[int]]:
+    """(label, operator, focal_len)"""
+    if step[-1] == 45: # '-'
+        return (step[:-1], "-", None)
+    label, fl_str = step.split(b"=")
+    return (label, "=", int(fl_str))
+
 
-    return sum(focusing_power(box, lenses) for box, lenses in enumerate(boxes))
+def both_parts(filename: str) -> Tuple[int, int]:
+    """Solves both parts in a single streaming pass over the file"""
+    p1 = 0
+    boxes = Boxes()
+    for step in iter_steps(filename):
+        p1 += HASH(step)
+        boxes.apply(*parse_step_bytes(step))
+    return p1, boxes.focusing_power
 
 
 if __name__ == '__main__':
-    p1 = part1('input')
+    p1, p2 = both_parts('input')
     print(f'Part 1: {p1}')
-    p2 = part2('input')
     print(f'Part 2: {p2}')
@@ -1,77 +1,74 @@
-from typing import List, Set, Tuple
-
-def read_grid(filename: str) -> List[List[str]]:
-    with open(filename) as f:
-        return [l.strip() for l in f.readlines()]
-
-
-def get_beam_grid(grid: List[str], incoming_pos: Tuple[int, int], incoming_dir: Tuple[int, int]) -> List[List[Set[Tuple[int, int]]]]:
-    def enqueue(queue, pos: Tuple[int, int], dir: Tuple[int, int], grid, beam_grid):
-        if pos[0] >= 0 and pos[0] < len(grid[0]) and pos[1] >= 0 and pos[1] < len(grid):
-            # Already processed a beam going this direction through here?
-            if dir not in beam_grid[pos[1]][pos[0]]:
-                beam_grid[pos[1]][pos[0]].add(dir)
-                queue.append((pos, dir))
-
-    queue = [(incoming_pos, incoming_dir)]
-    beam_grid = [[set() for _ in range(len(grid[0]))] for _ in range(len(grid))]
-    beam_grid[incoming_pos[1]][incoming_pos[0]].add(incoming_dir)
+import os
+import sys
+from typing import Tuple
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.grid import BORDER, Grid
+
+# Directions are indices into Grid.offsets: W E N S
+W, E, N, S = range(4)
+DIR_BY_STEP = {(-1, 0): W, (1, 0): E, (0, -1): N, (0, 1): S}
+
+# Outgoing directions for each incoming direction, by tile
+BEAM_TURNS = {
+    ord("."): {W: (W,), E: (E,), N: (N,), S: (S,)},
+    ord("|"): {W: (N, S), E: (N, S), N: (N,), S: (S,)},
+    ord("-"): {W: (W,), E: (E,), N: (W, E), S: (W, E)},
+    ord("\\"): {W: (N,), E: (S,), N: (W,), S: (E,)},
+    ord("/"): {W: (S,), E: (N,), N: (E,), S: (W,)},
+}
+
+
+def get_beam_grid(grid: Grid, incoming_pos: Tuple[int, int], incoming_dir: Tuple[int, int]) -> bytearray:
+    """
+    Returns a bitmask per grid cell index of the directions beams pass
+    through it in (bit d set for direction d)
+    """
+    data = grid.data
+    offsets = grid.offsets
+    turns = [BEAM_TURNS.get(c) for c in range(256)]
+
+    start = grid.index(*incoming_pos)
+    start_dir = DIR_BY_STEP[incoming_dir]
+    beam_grid = bytearray(len(data))
+    beam_grid[start] = 1 << start_dir
+    queue = [(start, start_dir)]
     while len(queue) > 0:
-        (x, y), (dir_x, dir_y) = queue.pop()
-        if grid[y][x] == ".":
-            enqueue(queue, (x + dir_x, y + dir_y), (dir_x, dir_y), grid, beam_grid)
-        elif grid[y][x] == "|":
-            if dir_y != 0:
-                # Vertical beam, not affected
-                enqueue(queue, (x + dir_x, y + dir_y), (dir_x, dir_y), grid, beam_grid)
-            else:
-                # Horizontal beam, split
-                enqueue(queue, (x, y - 1), (0, -1), grid, beam_grid)
-                enqueue(queue, (x, y + 1), (0, 1), grid, beam_grid)
-        elif grid[y][x] == "-":
-            if dir_x != 0:
-                # Horizontal beam, not affected
-                enqueue(queue, (x + dir_x, y + dir_y), (dir_x, dir_y), grid, beam_grid)
-            else:
-                # Vertical beam, split
-                enqueue(queue, (x - 1, y), (-1, 0), grid, beam_grid)
-                enqueue(queue, (x + 1, y), (1, 0), grid, beam_grid)
-        elif grid[y][x] == "\\":
-            new_dir_x = dir_y
-            new_dir_y = dir_x
-            enqueue(queue, (x + new_dir_x, y + new_dir_y), (new_dir_x, new_dir_y), grid, beam_grid)
-        else:
-            assert grid[y][x] == "/", "Unknown grid char"
-            new_dir_x = -dir_y
-            new_dir_y = -dir_x
-            enqueue(queue, (x + new_dir_x, y + new_dir_y), (new_dir_x, new_dir_y), grid, beam_grid)
+        i, dir = queue.pop()
+        for new_dir in turns[data[i]][dir]:
+            j = i + offsets[new_dir]
+            # Already processed a beam going this direction through here?
+            if data[j] != BORDER and not beam_grid[j] >> new_dir & 1:
+                beam_grid[j] |= 1 << new_dir
+                queue.append((j, new_dir))
 
     return beam_grid
 
 
-def total_energized_tiles(beam_grid: List[List[Set[Tuple[int, int]]]]) -> int:
-    return sum(1 for row in beam_grid for beams in row if len(beams) > 0)
+def total_energized_tiles(beam_grid: bytearray) -> int:
+    return len(beam_grid) - beam_grid.count(0)
 
 
-def beam_grid_str(beam_grid: List[List[Set[Tuple[int, int]]]]) -> str:
-    def beams_str(beams: Set[Tuple[int, int]]) -> str:
-        if len(beams) == 0:
+def beam_grid_str(grid: Grid, beam_grid: bytearray) -> str:
+    def beams_str(beams: int) -> str:
+        count = bin(beams).count("1")
+        if count == 0:
             return "."
-        elif len(beams) == 1:
+        elif count == 1:
             return "#"
         else:
-            return str(len(beams))
-    return "\n".join("".join(beams_str(b) for b in row) for row in beam_grid)
+            return str(count)
+    return "\n".join("".join(beams_str(beam_grid[grid.index(x, y)]) for x in range(grid.width)) for y in range(grid.height))
 
 
 def part1(filename: str) -> int:
-    grid = read_grid(filename)
+    grid = Grid.read(filename)
     beam_grid = get_beam_grid(grid, (0, 0), (1, 0))
     return total_energized_tiles(beam_grid)
 
 
 def part2(filename: str) -> int:
-    grid = read_grid(filename)
+    grid = Grid.read(filename)
     max_et = 0
     for dir_axis in 0, 1:
         for inv in -1, 1:
@@ -79,9 +76,9 @@ def part2(filename: str) -> int:
             dir[dir_axis] = inv
             dir = tuple(dir)
             if dir_axis == 0:
-                bound = len(grid)
+                bound = grid.height
             else:
-                bound = len(grid[0])
+                bound = grid.width
             for i in range(bound):
                 pos = [None, None]
                 if inv < 0:
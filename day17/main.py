@@ -1,9 +1,14 @@
 import heapq
-from typing import List, Set, Tuple, Optional
+import os
+import sys
+from typing import List, Set, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.grid import BORDER, Grid
 
 class DerivedNode:
     """A 'node' in Dijkstra's algorithm that includes """
-    def __init__(self, pos: (int, int), prev: Optional[Tuple[int, int]], straight_steps: int, path: List[Tuple[int, int]]):
+    def __init__(self, pos: int, prev: Optional[int], straight_steps: int, path: List[int]):
         self.pos = pos
         self.prev = prev
         self.straight_steps = straight_steps
@@ -28,7 +33,11 @@ class DerivedNode:
         return hash(self) < hash(other)
 
 
-def dj(graph: List[str], start: (int, int), goal: (int, int), min_straight_steps: int, max_straight_steps: int):
+ZERO = ord("0")
+
+
+def dj(graph: Grid, start: int, goal: int, min_straight_steps: int, max_straight_steps: int):
+    """Positions are cell indices into graph"""
     def enqueue(heat_loss: int, node: DerivedNode, queue):
         heapq.heappush(queue, (heat_loss, node))
 
@@ -45,13 +54,11 @@ def dj(graph: List[str], start: (int, int), goal: (int, int), min_straight_steps
         visited.add(dn)
 
         if dn.prev is None:
-            backwards = None
             forbidden_dirs = set()
             straight = None
         else:
-            backwards = (dn.prev[0] - dn.pos[0], dn.prev[1] - dn.pos[1])
-            forbidden_dirs = {backwards}
-            straight = (-backwards[0], -backwards[1])
+            straight = dn.pos - dn.prev
+            forbidden_dirs = {-straight}
         # By the time we "realize" we are in a straight step seq,
         # we are already on the first step of it, plotting the second.
         # So the first step has straight_steps=0, the second one is 1, etc.
@@ -60,62 +67,47 @@ def dj(graph: List[str], start: (int, int), goal: (int, int), min_straight_steps
         if dn.straight_steps < min_straight_steps - 1:
             if straight is not None:
                 # Must go straight
-                axis = 0 if straight[0] == 0 else 1
-                if axis == 0:
-                    forbidden_dirs.add((1, 0))
-                    forbidden_dirs.add((-1, 0))
-                else:
-                    forbidden_dirs.add((0, 1))
-                    forbidden_dirs.add((0, -1))
+                forbidden_dirs.update(d for d in graph.offsets if d != straight)
         elif dn.straight_steps >= max_straight_steps - 1:
             # Must not go straight
             forbidden_dirs.add(straight)
 
-        for axis in 0, 1:
-            for inv in -1, 1:
-                dx = inv if axis == 0 else 0
-                dy = inv if axis != 0 else 0
-                if (dx, dy) in forbidden_dirs:
-                    continue
+        for d in graph.offsets:
+            if d in forbidden_dirs:
+                continue
 
-                x = dn.pos[0] + dx
-                y = dn.pos[1] + dy
-                if x < 0 or x >= len(graph[0]) or y < 0 or y >= len(graph):
-                    continue
+            i = dn.pos + d
+            if graph.data[i] == BORDER:
+                continue
 
-                new_heat_loss = heat_loss + int(graph[y][x])
-                straight_steps = dn.straight_steps + 1 if (dx, dy) == straight else 0
-                enqueue(new_heat_loss, DerivedNode((x, y), dn.pos, straight_steps, dn.path + [(x, y)]), queue)
+            new_heat_loss = heat_loss + graph.data[i] - ZERO
+            straight_steps = dn.straight_steps + 1 if d == straight else 0
+            enqueue(new_heat_loss, DerivedNode(i, dn.pos, straight_steps, dn.path + [i]), queue)
 
     raise Exception("Goal not reached")
 
 
-def read_grid(filename: str) -> List[List[str]]:
-    with open(filename) as f:
-        return [l.strip() for l in f.readlines()]
-
-
 def part1(filename: str):
-    graph = read_grid(filename)
-    start = (0, 0)
-    end = (len(graph[0])-1, len(graph)-1)
+    graph = Grid.read(filename)
+    start = graph.index(0, 0)
+    end = graph.index(graph.width-1, graph.height-1)
     hl, path = dj(graph, start, end, 0, 3)
     # print(path_str(graph, path))
     return hl
 
 
 def part2(filename: str):
-    graph = read_grid(filename)
-    start = (0, 0)
-    end = (len(graph[0])-1, len(graph)-1)
+    graph = Grid.read(filename)
+    start = graph.index(0, 0)
+    end = graph.index(graph.width-1, graph.height-1)
     hl, path = dj(graph, start, end, 4, 10)
     # print(path_str(graph, path))
     return hl
 
 
-def path_str(grid: List[str], path: List[Tuple[int, int]]):
-    path = set(path)
-    return "\n".join("".join("*" if (x, y) in path else hl for x, hl in enumerate(row)) for y, row in enumerate(grid))
+def path_str(grid: Grid, path: List[int]):
+    path = {grid.pos(i) for i in path}
+    return "\n".join("".join("*" if (x, y) in path else chr(hl) for x, hl in enumerate(row)) for y, row in enumerate(grid.rows()))
 
 
 if __name__ == '__main__':
@@ -1,6 +1,11 @@
 from collections import deque
 from typing import Deque, Dict, List, Optional, Set, Tuple
 import itertools
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.grid import BORDER, Grid
 
 
 # def dj(graph: List[str], start: (int, int)):
@@ -35,35 +40,27 @@ import itertools
 #     raise Exception("Goal not reached")
 
 
-def step_iter(graph: List[str], pos: (int, int)):
-    for axis in 0, 1:
-        for inv in -1, 1:
-            dx = inv if axis == 0 else 0
-            dy = inv if axis != 0 else 0
-            x = pos[0] + dx
-            y = pos[1] + dy
-            if x < 0 or x >= len(graph[0]) or y < 0 or y >= len(graph):
-                continue
-            if graph[y][x] == "#":
-                continue
-            yield (x, y)
+ROCK = ord("#")
+
 
+def step_iter(graph: Grid, pos: int):
+    for d in graph.offsets:
+        i = pos + d
+        if graph.data[i] == BORDER or graph.data[i] == ROCK:
+            continue
+        yield i
 
-def explore(graph: List[str], start: (int, int), steps: int) -> {Tuple[int, int]}:
+
+def explore(graph: Grid, start: int, steps: int) -> Set[int]:
     frontier = {start}
     for _ in range(steps):
         frontier = {next_step for step in frontier for next_step in step_iter(graph, step)}
     return frontier
 
 
-def read_grid(filename: str) -> List[str]:
-    with open(filename, "r") as f:
-        grid = [line.strip() for line in f.readlines()]
-
-    for y, row in enumerate(grid):
-        for x, cell in enumerate(row):
-            if cell == "S":
-                start = (x, y)
+def read_grid(filename: str) -> Tuple[Grid, int]:
+    grid = Grid.read(filename)
+    start = grid.data.find(b"S")
 
     return grid, start
 
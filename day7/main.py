@@ -1,5 +1,19 @@
+import heapq
+import itertools
+import os
+import struct
+import sys
+import tempfile
+from array import array
 from collections import Counter
-from functools import cmp_to_key
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from common.fenwick import FenwickTree
 
 CARD_RANKS_P1 = {c: i for i, c in enumerate("23456789TJQKA")}
 CARD_RANKS_P2 = {c: i for i, c in enumerate("J23456789TQKA")}
@@ -91,17 +105,264 @@ def compare_hands_p2(hand1, hand2):
             return -1
     raise ValueError("Hands compare equal, but strings did not match")
     
+def hand_key(hand: str, hand_category, card_ranks):
+    """
+    Packs a hand into a single int that sorts the same as the comparators:
+    the category in the high bits, then 4 bits per card rank
+    """
+    key = hand_category(hand)
+    for c in hand:
+        key = (key << 4) | card_ranks[c]
+    return key
+
+def hand_key_p1(hand: str):
+    return hand_key(hand, hand_category_p1, CARD_RANKS_P1)
+
+def hand_key_p2(hand: str):
+    return hand_key(hand, hand_category_p2, CARD_RANKS_P2)
+
+def total_winnings(hands, hand_key):
+    keyed = [(hand_key(hand), bid) for hand, bid in hands]
+    keyed.sort()
+
+    return sum(bid * (rank + 1) for (rank, (_, bid)) in enumerate(keyed))
+
 def part1(filename):
     hands = [parse_line(l) for l in read_lines(filename)]
-    hands.sort(key=lambda h_b: cmp_to_key(compare_hands_p1)(h_b[0]))
-
-    return sum(bid * (rank + 1) for (rank, (_, bid)) in enumerate(hands))
+    return total_winnings(hands, hand_key_p1)
 
 def part2(filename):
     hands = [parse_line(l) for l in read_lines(filename)]
-    hands.sort(key=lambda h_b: cmp_to_key(compare_hands_p2)(h_b[0]))
+    return total_winnings(hands, hand_key_p2)
+
+# Slot tables already built, keyed by (hand_category, cards in rank order)
+SLOT_TABLES = {}
+
+def slot_table(hand_category, card_ranks):
+    """
+    Where every possible hand sorts among all of them, indexed by its card
+    ranks read as a base len(card_ranks) number. Only the card counts decide
+    the category, so it's worked out once per multiset of cards.
+    """
+    cards = "".join(sorted(card_ranks, key=card_ranks.get))
+    table_key = (hand_category, cards)
+    if table_key not in SLOT_TABLES:
+        categories = {}
+        hand_categories = array("B")
+        for ranks in itertools.product(range(len(cards)), repeat=5):
+            multiset = tuple(sorted(ranks))
+            if multiset not in categories:
+                categories[multiset] = hand_category("".join(cards[r] for r in multiset))
+            hand_categories.append(categories[multiset])
+
+        # Hands of a category take the next slots after the lower categories,
+        # and within one they already sort by index
+        category_counts = Counter(hand_categories)
+        next_slot = {}
+        slot = 0
+        for category in sorted(category_counts):
+            next_slot[category] = slot
+            slot += category_counts[category]
+        table = array("I", bytes(4 * len(hand_categories)))
+        for i, category in enumerate(hand_categories):
+            table[i] = next_slot[category]
+            next_slot[category] += 1
+        SLOT_TABLES[table_key] = table
+    return SLOT_TABLES[table_key]
+
+class Leaderboard:
+    """
+    Keeps the total winnings of a changing set of hands up to date.
+    Every possible hand has a slot, ordered like the packed hand keys,
+    so inserts, removals and rank queries are O(log n) without re-sorting.
+
+    The memory is fixed rather than growing with the hands: with 13 cards
+    there are 13**5 = 371293 slots, so each of the two Fenwick trees takes
+    about 3 MB. The 1.5 MB table of slots is built once (about 0.3 s) and
+    shared by every leaderboard with the same rules.
+    """
+    def __init__(self, hand_category, card_ranks):
+        self.card_ranks = card_ranks
+        self.slots = slot_table(hand_category, card_ranks)
+        self.counts = FenwickTree(len(self.slots))
+        self.bid_sums = FenwickTree(len(self.slots))
+        self.bids = {}
+        self.total_winnings = 0
+
+    def slot(self, hand: str):
+        index = 0
+        for c in hand:
+            index = index * len(self.card_ranks) + self.card_ranks[c]
+        return self.slots[index]
+
+    def winnings_delta(self, slot, bid):
+        """Change in total winnings from the hand in slot, given the other hands"""
+        rank = self.counts.prefix(slot) + 1
+        bids_above = self.bid_sums.total - self.bid_sums.prefix(slot + 1)
+        return bid * rank + bids_above
+
+    def insert(self, hand: str, bid: int):
+        if hand in self.bids:
+            raise ValueError(f"Hand {hand} is already on the leaderboard")
+        slot = self.slot(hand)
+        self.total_winnings += self.winnings_delta(slot, bid)
+        self.counts.add(slot, 1)
+        self.bid_sums.add(slot, bid)
+        self.bids[hand] = bid
+
+    def remove(self, hand: str):
+        bid = self.bids.pop(hand)
+        slot = self.slot(hand)
+        self.counts.add(slot, -1)
+        self.bid_sums.add(slot, -bid)
+        self.total_winnings -= self.winnings_delta(slot, bid)
+        return bid
+
+    def rank(self, hand: str):
+        if hand not in self.bids:
+            raise KeyError(hand)
+        return self.counts.prefix(self.slot(hand)) + 1
+
+    def __len__(self):
+        return len(self.bids)
+
+def leaderboard_p1():
+    return Leaderboard(hand_category_p1, CARD_RANKS_P1)
+
+def leaderboard_p2():
+    return Leaderboard(hand_category_p2, CARD_RANKS_P2)
+
+# (hand key, bid) records written to the sorted runs of the external sort
+RUN_RECORD = struct.Struct("<IQ")
+
+def iter_lines(filename):
+    with open(filename) as f:
+        yield from f
+
+def new_run_path(run_dir):
+    fd, path = tempfile.mkstemp(dir=run_dir, suffix=".run")
+    os.close(fd)
+    return path
+
+def write_run(records, run_dir):
+    records.sort()
+    path = new_run_path(run_dir)
+    with open(path, "wb") as run:
+        run.write(b"".join(RUN_RECORD.pack(key, bid) for key, bid in records))
+    return path
+
+def read_run(path, buffer_records):
+    with open(path, "rb") as run:
+        while chunk := run.read(RUN_RECORD.size * buffer_records):
+            yield from RUN_RECORD.iter_unpack(chunk)
+
+def merge_runs(paths, run_dir, buffer_records):
+    """Merges sorted runs into a single new run, deleting the old ones"""
+    path = new_run_path(run_dir)
+    with open(path, "wb") as run:
+        merged = heapq.merge(*(read_run(p, buffer_records) for p in paths))
+        while batch := list(itertools.islice(merged, buffer_records)):
+            run.write(b"".join(RUN_RECORD.pack(key, bid) for key, bid in batch))
+    for p in paths:
+        os.remove(p)
+    return path
+
+def total_winnings_external(filename, hand_key, run_records=1_000_000, max_merge_runs=64, tmp_dir=None):
+    """
+    Computes total winnings for files that don't fit in memory.
+    At most run_records (key, bid) pairs are held at once: the input is
+    streamed into sorted runs on disk, which are merged at most
+    max_merge_runs at a time (so at most that many runs are open, plus the
+    one being written) until few enough are left to merge in one last pass
+    that assigns the ranks.
+    """
+    if run_records < 1:
+        raise ValueError(f"run_records must be at least 1, got {run_records}")
+    if max_merge_runs < 2:
+        raise ValueError(f"max_merge_runs must be at least 2, got {max_merge_runs}")
+
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as run_dir:
+        runs = []
+        records = []
+        for line in iter_lines(filename):
+            if not line.strip():
+                continue
+            hand, bid = parse_line(line)
+            records.append((hand_key(hand), bid))
+            if len(records) >= run_records:
+                runs.append(write_run(records, run_dir))
+                records = []
+        if records:
+            runs.append(write_run(records, run_dir))
+            records = []
+
+        buffer_records = max(1, run_records // (max_merge_runs + 1))
+        while len(runs) > max_merge_runs:
+            runs = [
+                merge_runs(runs[i:i + max_merge_runs], run_dir, buffer_records)
+                for i in range(0, len(runs), max_merge_runs)
+            ]
+
+        merged = heapq.merge(*(read_run(run, buffer_records) for run in runs))
+        return sum(bid * rank for (rank, (_, bid)) in enumerate(merged, 1))
+
+def part1_external(filename, run_records=1_000_000, max_merge_runs=64, tmp_dir=None):
+    return total_winnings_external(filename, hand_key_p1, run_records, max_merge_runs, tmp_dir)
+
+def part2_external(filename, run_records=1_000_000, max_merge_runs=64, tmp_dir=None):
+    return total_winnings_external(filename, hand_key_p2, run_records, max_merge_runs, tmp_dir)
+
+# Sum over the cards of how many times that card appears in the hand,
+# i.e. the sum of the squared group sizes, uniquely identifies a category
+SQUARED_COUNTS_TO_CATEGORY = {25: 10, 17: 9, 13: 8, 11: 7, 9: 6, 7: 5, 5: 4}
+
+def hand_keys_np(hands, card_ranks, jokers=False):
+    """
+    Builds the packed keys of hand_key for a whole list of hands at once.
+    With jokers, each J joins the largest group of the other cards.
+    """
+    rank_lut = np.zeros(256, dtype=np.int64)
+    for c, rank in card_ranks.items():
+        rank_lut[ord(c)] = rank
+    chars = np.frombuffer("".join(hands).encode("ascii"), dtype=np.uint8)
+    ranks = rank_lut[chars].reshape(-1, 5)
+
+    same = ranks[:, :, None] == ranks[:, None, :]
+    if jokers:
+        not_joker = ranks != card_ranks["J"]
+        same &= not_joker[:, :, None] & not_joker[:, None, :]
+        counts = same.sum(axis=2)
+        largest = counts.max(axis=1)
+        js = 5 - not_joker.sum(axis=1)
+        squared = counts.sum(axis=1) - largest * largest + (largest + js) ** 2
+    else:
+        squared = same.sum(axis=(1, 2))
+
+    category_lut = np.zeros(26, dtype=np.int64)
+    for s, category in SQUARED_COUNTS_TO_CATEGORY.items():
+        category_lut[s] = category
+    keys = category_lut[squared]
+    for i in range(5):
+        keys = (keys << 4) | ranks[:, i]
+    return keys
+
+def total_winnings_np(filename, card_ranks, jokers=False):
+    if np is None:
+        hand_category = hand_category_p2 if jokers else hand_category_p1
+        hands = [parse_line(l) for l in read_lines(filename)]
+        return total_winnings(hands, lambda hand: hand_key(hand, hand_category, card_ranks))
+
+    hands, bids = zip(*(parse_line(l) for l in read_lines(filename)))
+    keys = hand_keys_np(hands, card_ranks, jokers)
+    bids = np.array(bids, dtype=np.int64)[np.argsort(keys, kind="stable")]
+
+    return int((bids * np.arange(1, len(bids) + 1, dtype=np.int64)).sum())
+
+def part1_np(filename):
+    return total_winnings_np(filename, CARD_RANKS_P1)
 
-    return sum(bid * (rank + 1) for (rank, (_, bid)) in enumerate(hands))
+def part2_np(filename):
+    return total_winnings_np(filename, CARD_RANKS_P2, jokers=True)
     
 if __name__ == "__main__":
     print(f"Part 1: {part1("input")}")
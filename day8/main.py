@@ -1,3 +1,5 @@
+from math import gcd
+
 def read_lines(filename):
     with open(filename) as f:
         return f.readlines()
@@ -9,7 +11,82 @@ def parse_map_line(line):
 
     return (key.strip(), (left.strip(), right.strip()))
 
-def part1(filename):
+class Network:
+    """
+    The map compiled to integer node ids, with tables for whole passes
+    through the LR instructions.
+
+    pass_nodes[n * len(lr) + i] is the node reached i steps into a pass
+    started at n, and end_offsets[n] are the step counts within a pass
+    started at n that land on an end node. jumps[j][n] is the node
+    reached after 2**j passes and jump_ends[j][n] whether any end node
+    was hit along the way.
+    """
+    def __init__(self, lr, adj_map, is_end):
+        self.lr = lr
+        self.names = list(adj_map.keys())
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.is_end = [is_end(name) for name in self.names]
+        left = [self.ids[l] for l, _ in adj_map.values()]
+        right = [self.ids[r] for _, r in adj_map.values()]
+        moves = [left if dir == 'L' else right for dir in lr]
+
+        node_count = len(self.names)
+        self.pass_nodes = [0] * (node_count * len(lr))
+        self.end_offsets = [[] for _ in range(node_count)]
+        after_pass = [0] * node_count
+        for start in range(node_count):
+            node = start
+            base = start * len(lr)
+            for i, move in enumerate(moves):
+                self.pass_nodes[base + i] = node
+                node = move[node]
+                if self.is_end[node]:
+                    self.end_offsets[start].append(i + 1)
+            after_pass[start] = node
+
+        # Following passes from any node must cycle within node_count passes,
+        # so if no end node has been hit by then, none ever will be
+        self.jumps = [after_pass]
+        self.jump_ends = [[len(offsets) > 0 for offsets in self.end_offsets]]
+        while 1 << (len(self.jumps) - 1) < node_count:
+            self.add_jump_level()
+
+    def add_jump_level(self):
+        prev, prev_ends = self.jumps[-1], self.jump_ends[-1]
+        self.jumps.append([prev[prev[n]] for n in range(len(prev))])
+        self.jump_ends.append([prev_ends[n] or prev_ends[prev[n]] for n in range(len(prev))])
+
+    def node_after_passes(self, node, passes):
+        j = 0
+        while passes:
+            if j == len(self.jumps):
+                self.add_jump_level()
+            if passes & 1:
+                node = self.jumps[j][node]
+            passes >>= 1
+            j += 1
+        return node
+
+    def position_after(self, name, steps):
+        """Name of the node reached after the given number of steps from name"""
+        passes, offset = divmod(steps, len(self.lr))
+        node = self.node_after_passes(self.ids[name], passes)
+        return self.names[self.pass_nodes[node * len(self.lr) + offset]]
+
+    def steps_until_end(self, name):
+        """Steps until the first end node is reached from name, or None if it never is"""
+        node = self.ids[name]
+        passes = 0
+        for j in reversed(range(len(self.jumps))):
+            if not self.jump_ends[j][node]:
+                node = self.jumps[j][node]
+                passes += 1 << j
+        if not self.end_offsets[node]:
+            return None
+        return passes * len(self.lr) + self.end_offsets[node][0]
+
+def read_network(filename, is_end):
     lines = read_lines(filename)
 
     lr = lines[0].strip()
@@ -17,24 +94,11 @@ def part1(filename):
 
     adj_map = {key: value for (key, value) in map(parse_map_line, lines)}
 
-    steps = 0
-    zzz_found = False
-    key = "AAA"
-    while not zzz_found:
-        for dir in lr:
-            left, right = adj_map[key]
-            if dir == 'L':
-                key = left
-            else:
-                key = right
-
-            steps += 1
+    return Network(lr, adj_map, is_end)
 
-            if key == "ZZZ":
-                zzz_found = True
-                break
-
-    return steps
+def part1(filename):
+    network = read_network(filename, lambda key: key == "ZZZ")
+    return network.steps_until_end("AAA")
 
 def part2(filename):
     lines = read_lines(filename)
@@ -139,40 +203,103 @@ def part2_3(filename):
     """
     They repeat, but not with the same LR iteration point (at least not for many iterations)
     """
-    lines = read_lines(filename)
+    network = read_network(filename, lambda key: key[2] == "Z")
 
-    lr = lines[0].strip()
-    lines = lines[2:]
-
-    adj_map = {key: value for (key, value) in map(parse_map_line, lines)}
+    step_counts = [network.steps_until_end(k) for k in network.names if k[2] == "A"]
 
-    keys = [[k] for k in adj_map.keys() if k[2] == "A"]
-    step_counts = []
-    for i, key_seq in enumerate(keys):
-        zs_found = False
-        steps = 0
-        while not zs_found:
-            for dir in lr:
-                key = key_seq[-1]
-                left, right = adj_map[key]
-                if dir == 'L':
-                    key = left
-                else:
-                    key = right
-                key_seq.append(key)
-
-                steps += 1
+    return lcm(step_counts)
 
-                if key[2] == "Z":
-                    step_counts.append(steps)
-                    zs_found = True
-                    break
 
-    return lcm(step_counts)
+def ghost_cycle(network, name):
+    """
+    Follows the (node, lr_index) states of a ghost at the start of each pass
+    until one repeats. Returns (prefix_len, cycle_len, prefix_ends, cycle_ends):
+    every end node hit before step prefix_len is in prefix_ends, and from
+    then on the end nodes are hit exactly at the steps congruent to one of
+    cycle_ends modulo cycle_len.
+    """
+    lr_len = len(network.lr)
+    seen = {}
+    starts = []
+    node = network.ids[name]
+    while node not in seen:
+        seen[node] = len(starts)
+        starts.append(node)
+        node = network.jumps[0][node]
+    cycle_start = seen[node]
+
+    def pass_ends(passes):
+        return [p * lr_len + offset for p in passes for offset in network.end_offsets[starts[p]]]
+
+    prefix_ends = pass_ends(range(cycle_start))
+    cycle_ends = pass_ends(range(cycle_start, len(starts)))
+    return cycle_start * lr_len, (len(starts) - cycle_start) * lr_len, prefix_ends, cycle_ends
+
+def crt(a1, m1, a2, m2):
+    """
+    Combines t = a1 (mod m1) and t = a2 (mod m2) into t = a (mod lcm(m1, m2)),
+    or returns None if they can never both hold
+    """
+    g = gcd(m1, m2)
+    if (a2 - a1) % g:
+        return None
+    m = m1 // g * m2
+    k = (a2 - a1) // g * pow(m1 // g, -1, m2 // g) % (m2 // g)
+    return (a1 + m1 * k) % m, m
+
+def first_common_end(cycles):
+    """
+    First step at which every ghost is on an end node, or None if that
+    never happens. cycles are the results of ghost_cycle.
+    """
+    def is_end(cycle, t):
+        prefix_len, cycle_len, prefix_ends, cycle_ends = cycle
+        if t <= prefix_len:
+            return t in prefix_ends
+        return (t - prefix_len - 1) % cycle_len + prefix_len + 1 in cycle_ends
+
+    cycles = [(p, c, set(pe), set(ce)) for p, c, pe, ce in cycles]
+    all_periodic = max(prefix_len for prefix_len, _, _, _ in cycles)
+
+    # Until every ghost is in its cycle, check the first ghost's end hits directly
+    prefix_len, cycle_len, prefix_ends, cycle_ends = cycles[0]
+    candidates = sorted(prefix_ends) + [
+        t + k * cycle_len
+        for k in range((all_periodic - prefix_len) // cycle_len + 1)
+        for t in sorted(cycle_ends)
+    ]
+    for t in candidates:
+        if t > all_periodic:
+            break
+        if all(is_end(cycle, t) for cycle in cycles):
+            return t
+
+    # After that, every ghost hits end nodes periodically
+    residues = {(t, cycle_len) for t in cycle_ends}
+    for _, cycle_len, _, cycle_ends in cycles[1:]:
+        residues = {
+            combined
+            for a1, m1 in residues
+            for a2 in cycle_ends
+            if (combined := crt(a1, m1, a2, cycle_len)) is not None
+        }
+    if not residues:
+        return None
+    # Smallest step after all_periodic in each residue class
+    return min(a + (all_periodic - a) // m * m + m for a, m in residues)
+
+def part2_crt(filename):
+    """
+    Solves part 2 for any network, without assuming each ghost's cycle
+    starts at its first end node
+    """
+    network = read_network(filename, lambda key: key[2] == "Z")
+    cycles = [ghost_cycle(network, k) for k in network.names if k[2] == "A"]
+    return first_common_end(cycles)
 
 
 if __name__ == "__main__":
     p1 = part1("input")
     print(f"Part 1: {p1}")
-    p2 = part2_3('input')
+    p2 = part2_crt('input')
     print(f"Part 2: {p2}")
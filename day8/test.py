@@ -1,3 +1,8 @@
+import random
+from math import lcm
+
+from main import Network, first_common_end, ghost_cycle
+
 def align(cycle_1_len, offset_1, cycle_2_len, offset_2):
     """Returns the alignment of two cycles"""
     z = (offset_2 - offset_1) % cycle_2_len
@@ -19,6 +24,50 @@ def test_align(cycle_1_len, offset_1, cycle_2_len, offset_2):
     print(f"{left} == {right}")
     assert left == right
 
+def cycle_is_end(cycle, t):
+    """Whether a ghost_cycle style ghost is on an end node at step t"""
+    prefix_len, cycle_len, prefix_ends, cycle_ends = cycle
+    if t <= prefix_len:
+        return t in prefix_ends
+    return (t - prefix_len - 1) % cycle_len + prefix_len + 1 in cycle_ends
+
+def brute_force_cycles(cycles):
+    """Steps through every t until all ghosts are periodic and a full lcm of cycles has passed"""
+    limit = max(c[0] for c in cycles) + lcm(*(c[1] for c in cycles))
+    for t in range(1, limit + 1):
+        if all(cycle_is_end(cycle, t) for cycle in cycles):
+            return t
+    return None
+
+def test_first_common_end(cycles, expected):
+    print(f"{cycles} -> {expected}")
+    assert brute_force_cycles(cycles) == expected
+    assert first_common_end(cycles) == expected
+
+def test_random_networks(trials=500, seed=8):
+    rng = random.Random(seed)
+    for _ in range(trials):
+        node_count = rng.randint(1, 6)
+        names = [f"N{i}" + ("Z" if rng.random() < 0.4 else "A") for i in range(node_count)]
+        adj_map = {name: (rng.choice(names), rng.choice(names)) for name in names}
+        lr = "".join(rng.choice("LR") for _ in range(rng.randint(1, 3)))
+        network = Network(lr, adj_map, lambda name: name.endswith("Z"))
+        starts = rng.sample(names, rng.randint(1, min(3, node_count)))
+
+        states = node_count * len(lr)
+        expected = None
+        positions = list(starts)
+        for t in range(1, states + states ** len(starts) + 1):
+            dir = lr[(t - 1) % len(lr)]
+            positions = [adj_map[p][dir == "R"] for p in positions]
+            if all(p.endswith("Z") for p in positions):
+                expected = t
+                break
+
+        cycles = [ghost_cycle(network, name) for name in starts]
+        assert first_common_end(cycles) == expected, (lr, adj_map, starts)
+    print(f"{trials} random networks match brute force")
+
 
 if __name__ == "__main__":
     test_align(5, 3, 7, 5)
@@ -28,4 +77,29 @@ if __name__ == "__main__":
     print()
 
     test_align(53, 20, 67, 10)
-    print()
\ No newline at end of file
+    print()
+
+    # Coprime cycles with one end each agree with align
+    a, _ = align(5, 3, 7, 5)
+    test_first_common_end([(0, 5, [], [3]), (0, 7, [], [5])], 5*a + 3)
+    print()
+
+    # Cycle lengths sharing a factor, with several end hits per cycle
+    test_first_common_end([(0, 4, [], [1, 2]), (0, 6, [], [3, 5])], 5)
+    test_first_common_end([(2, 6, [1], [4, 7, 8]), (0, 9, [], [5, 9])], 14)
+    print()
+
+    # Cycle lengths sharing a factor whose residues never line up
+    test_first_common_end([(0, 4, [], [2, 4]), (0, 6, [], [3])], None)
+    print()
+
+    # A ghost that never sees an end node
+    test_first_common_end([(0, 3, [], [3]), (1, 2, [], [])], None)
+    print()
+
+    # An end hit before one ghost reaches its cycle
+    test_first_common_end([(3, 4, [2], [5]), (0, 2, [], [2])], 2)
+    test_first_common_end([(5, 2, [1, 3], [7]), (0, 3, [], [3])], 3)
+    print()
+
+    test_random_networks()
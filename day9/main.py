@@ -1,4 +1,9 @@
-from typing import List
+from typing import Iterator, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 def all_zeros(seq: List[int]) -> bool:
     return all(x==0 for x in seq)
@@ -28,6 +33,45 @@ def predict_prev(derivatives: List[List[int]]) -> int:
     return sum(d_seq[0] * (((i % 2) * 2) - 1) * -1 for i, d_seq in enumerate(derivatives))
 
 
+class Forecaster:
+    """
+    Predicts a sequence any number of steps past either end from its Newton
+    difference coefficients, which are computed once without keeping the
+    whole derivative pyramid around. Each prediction is O(degree).
+    """
+    def __init__(self, seq: List[int]):
+        assert len(seq) > 0
+        # leading[k] is the first and trailing[k] the last kth order derivative
+        self.leading: List[int] = []
+        self.trailing: List[int] = []
+        diffs = list(seq)
+        while diffs and not all_zeros(diffs):
+            self.leading.append(diffs[0])
+            self.trailing.append(diffs[-1])
+            for i in range(len(diffs) - 1):
+                diffs[i] = diffs[i+1] - diffs[i]
+            diffs.pop()
+        assert diffs, "Sequence is not a polynomial of degree < its length"
+
+    @staticmethod
+    def _extrapolate(coeffs: List[int], steps: int, sign: int) -> int:
+        # Sum of C(steps+k-1, k) * coeffs[k], alternating in sign going backwards
+        total = 0
+        c = 1
+        for k, coeff in enumerate(coeffs):
+            total += c * coeff
+            c = c * (steps + k) // (k + 1) * sign
+        return total
+
+    def ahead(self, steps: int) -> int:
+        """Value steps positions after the last element"""
+        return self._extrapolate(self.trailing, steps, 1)
+
+    def behind(self, steps: int) -> int:
+        """Value steps positions before the first element"""
+        return self._extrapolate(self.leading, steps, -1)
+
+
 def read_lines(filename: str) -> List[str]:
     with open(filename) as f:
         return f.readlines()
@@ -36,22 +80,76 @@ def parse_line(line: str) -> List[int]:
     return list(map(int, line.strip().split(" ")))
 
 
-def part1(filename: str) -> int:
-    lines = read_lines(filename)
-    parsed_lines = map(parse_line, lines)
+def stream_rows(filename: str) -> Iterator[List[int]]:
+    with open(filename) as f:
+        for line in f:
+            if line.strip():
+                yield parse_line(line)
 
-    return sum(predict_next(derivatives_all_orders(parsed_line)) for parsed_line in parsed_lines)
+
+def predictions(rows: Iterator[List[int]]) -> Iterator[Tuple[int, int]]:
+    """Yields the (next, previous) prediction of each row"""
+    for row in rows:
+        forecaster = Forecaster(row)
+        yield forecaster.ahead(1), forecaster.behind(1)
+
+
+def both_parts(filename: str) -> Tuple[int, int]:
+    """Solves both parts in a single pass over the file"""
+    next_sum, prev_sum = 0, 0
+    for next_val, prev_val in predictions(stream_rows(filename)):
+        next_sum += next_val
+        prev_sum += prev_val
+    return next_sum, prev_sum
+
+
+def part1(filename: str) -> int:
+    return sum(next_val for next_val, _ in predictions(stream_rows(filename)))
 
 
 def part2(filename: str) -> int:
-    lines = read_lines(filename)
-    parsed_lines = map(parse_line, lines)
+    return sum(prev_val for _, prev_val in predictions(stream_rows(filename)))
+
+
+def read_array(filename: str) -> "np.ndarray":
+    """Loads a file of equal length rows into a 2-D integer array"""
+    if np is None:
+        raise ImportError("read_array requires numpy")
+    with open(filename) as f:
+        lines = f.read().split("\n")
+    lines = [l for l in lines if l.strip()]
+    return np.array(" ".join(lines).split(), dtype=np.int64).reshape(len(lines), -1)
+
+
+def predict_batch(rows: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """Returns the next and previous prediction for every row of the array"""
+    next_vals = np.zeros(rows.shape[0], dtype=rows.dtype)
+    prev_vals = np.zeros(rows.shape[0], dtype=rows.dtype)
+    derivatives = rows
+    sign = 1
+    while derivatives.shape[1] > 0 and derivatives.any():
+        next_vals += derivatives[:, -1]
+        prev_vals += sign * derivatives[:, 0]
+        derivatives = np.diff(derivatives, axis=1)
+        sign = -sign
+    return next_vals, prev_vals
+
+
+def part1_np(filename: str) -> int:
+    if np is None:
+        return part1(filename)
+    next_vals, _ = predict_batch(read_array(filename))
+    return int(next_vals.sum())
+
 
-    return sum(predict_prev(derivatives_all_orders(parsed_line)) for parsed_line in parsed_lines)
+def part2_np(filename: str) -> int:
+    if np is None:
+        return part2(filename)
+    _, prev_vals = predict_batch(read_array(filename))
+    return int(prev_vals.sum())
 
 
 if __name__ == "__main__":
-    p1 = part1("input")
+    p1, p2 = both_parts("input")
     print(f"Part 1: {p1}")
-    p2 = part2("input")
     print(f"Part 2: {p2}")